@@ -1,13 +1,22 @@
+import cProfile
+import hashlib
+import hmac
+import json
+import os
+import pstats
 import re
+import threading
+import time
 import requests
 from functools import wraps
 
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, send_from_directory, url_for
 
 from config import get_settings
 
 EMAIL_REGEX = re.compile(r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$")
 from scraper import Listing, scrape_canadian_internships, scrape_us_internships
+from scheduler import PollScheduler
 
 
 app = Flask(__name__)
@@ -16,18 +25,119 @@ settings = get_settings()
 
 JSONBIN_URL = "https://api.jsonbin.io/v3/b/696e9788ae596e708fe75161"
 
+# Tracked sources: state key -> (display name, scraper, repo URL)
+SOURCES = {
+    "canadian_internships": (
+        "Canadian Tech Internships 2026",
+        scrape_canadian_internships,
+        settings.canadian_internships_url,
+    ),
+    "us_internships": (
+        "US Summer 2026 Internships",
+        scrape_us_internships,
+        settings.us_internships_url,
+    ),
+}
+
+scheduler = PollScheduler(
+    keys=list(SOURCES),
+    poll=lambda keys: run_scrape(keys),
+    load=lambda: read_jsonbin().get("schedule"),
+    initial_interval=settings.scheduler_initial_interval_seconds,
+    min_interval=settings.scheduler_min_interval_seconds,
+    max_interval=settings.scheduler_max_interval_seconds,
+    jitter=settings.scheduler_jitter,
+)
+
+
+PROFILE_SORT_KEYS = {"cumulative": 3, "tottime": 2, "ncalls": 1}
+
 
 def require_api_key(f):
-    """Decorator to require API key for protected endpoints."""
+    """Decorator to require API key for protected endpoints.
+
+    Protected endpoints can be profiled per request with ?profile=1 or an
+    X-Profile: 1 header.
+    """
     @wraps(f)
     def decorated(*args, **kwargs):
         api_key = request.headers.get("API-Key")
         if api_key != settings.api_key:
             return jsonify({"error": "Unauthorized"}), 401
+        if request.args.get("profile") == "1" or request.headers.get("X-Profile") == "1":
+            return profile_request(f, *args, **kwargs)
         return f(*args, **kwargs)
     return decorated
 
 
+def profile_request(f, *args, **kwargs):
+    """Run a handler under cProfile, save the profile and return its hot functions.
+
+    JSON responses are wrapped with the profile; other responses are returned
+    unchanged with the profile file name in X-Profile-* headers.
+    """
+    sort = request.args.get("profile_sort", "cumulative")
+    if sort not in PROFILE_SORT_KEYS:
+        return jsonify({"error": f"profile_sort must be one of {list(PROFILE_SORT_KEYS)}"}), 400
+
+    profiler = cProfile.Profile()
+    response = app.make_response(profiler.runcall(f, *args, **kwargs))
+    stats = pstats.Stats(profiler)
+
+    # Save the full profile so it can be loaded with pstats or snakeviz later
+    os.makedirs(settings.profile_dir, exist_ok=True)
+    filename = f"{request.endpoint}-{int(time.time() * 1000)}.prof"
+    stats.dump_stats(os.path.join(settings.profile_dir, filename))
+    prune_profiles()
+
+    index = PROFILE_SORT_KEYS[sort]
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][index], reverse=True)
+    top = [
+        {
+            "function": f"{path}:{line}({name})",
+            "ncalls": ncalls,
+            "tottime": round(tottime, 6),
+            "cumtime": round(cumtime, 6),
+        }
+        for (path, line, name), (_, ncalls, tottime, cumtime, _) in rows[:settings.profile_top_n]
+    ]
+
+    print(f"[PROFILE] {request.endpoint} took {stats.total_tt:.3f}s, saved {filename}", flush=True)
+    if not response.is_json:
+        # Keep non-JSON output (e.g. file downloads) intact and point to the profile in headers
+        response.headers["X-Profile-File"] = filename
+        response.headers["X-Profile-Download"] = url_for("get_profile", filename=filename)
+        response.headers["X-Profile-Total-Seconds"] = f"{stats.total_tt:.6f}"
+        return response
+
+    return jsonify({
+        "profile": {
+            "file": filename,
+            "download": url_for("get_profile", filename=filename),
+            "total_seconds": round(stats.total_tt, 6),
+            "sort": sort,
+            "top": top,
+        },
+        "status_code": response.status_code,
+        "response": response.get_json(silent=True),
+    }), response.status_code
+
+
+def prune_profiles() -> None:
+    """Delete the oldest saved profiles beyond PROFILE_MAX_FILES."""
+    paths = [
+        os.path.join(settings.profile_dir, name)
+        for name in os.listdir(settings.profile_dir)
+        if name.endswith(".prof")
+    ]
+    paths.sort(key=os.path.getmtime, reverse=True)
+    for path in paths[settings.profile_max_files:]:
+        try:
+            os.remove(path)
+        except OSError as e:
+            print(f"[PROFILE] Error deleting {path}: {e}", flush=True)
+
+
 DEFAULT_STATE = {
     "canadian_internships": {
         "company": "PlayStation",
@@ -278,13 +388,27 @@ If this was a mistake, you can re-subscribe at any time.
         return False
 
 
-def send_notification(new_listings: list[Listing], repo_name: str, emails: list[str]) -> None:
-    """Send email notification for new listings via Brevo API."""
+def format_digest_body(sections: dict[str, list[Listing]]) -> str:
+    """Format email body with one section per source."""
+    return "".join(
+        format_email_body(listings, repo_name)
+        for repo_name, listings in sections.items()
+        if listings
+    )
+
+
+def send_notification(sections: dict[str, list[Listing]], emails: list[str]) -> bool:
+    """Send email notification for new listings via Brevo API. Returns True if successful."""
     if not emails:
-        return
+        return False
 
-    body_text = format_email_body(new_listings, repo_name)
-    subject = f"New Internship Listings - {repo_name}"
+    body_text = format_digest_body(sections)
+    repo_names = [name for name, listings in sections.items() if listings]
+    if len(repo_names) == 1:
+        subject = f"New Internship Listings - {repo_names[0]}"
+    else:
+        count = sum(len(listings) for listings in sections.values())
+        subject = f"New Internship Listings - {count} new across {len(repo_names)} repos"
     
     # First recipient in "to", rest in "bcc" for privacy                           
     bcc_array = [{"email": email} for email in emails] 
@@ -315,89 +439,275 @@ def send_notification(new_listings: list[Listing], repo_name: str, emails: list[
         )
         response.raise_for_status()
         print(f"[EMAIL] Successfully sent to {len(emails)} recipients", flush=True)
+        return True
     except Exception as e:
         print(f"[EMAIL] Error sending: {e}", flush=True)
         if hasattr(e, 'response') and e.response:
             print(f"[EMAIL] Response: {e.response.text}", flush=True)
+        return False
 
 
-@app.route("/scrape", methods=["GET"])
-@require_api_key
-def scrape():
-    """Scrape repos and send notifications for new listings."""
-    print("[SCRAPE] Starting...", flush=True)
+def buffer_digest(state: dict, repo_name: str, new_listings: list[Listing]) -> None:
+    """Add new listings to the pending digest stored in state."""
+    digest = state.get("pending_digest") or {"started_at": time.time(), "sections": {}}
+    section = digest["sections"].setdefault(repo_name, [])
+    section.extend(l.to_dict() for l in new_listings)
+    state["pending_digest"] = digest
+
+
+def flush_digest(state: dict, emails: list[str], force: bool = False) -> dict:
+    """Send the pending digest if its window has elapsed or it is large enough."""
+    digest = state.get("pending_digest")
+    if not digest or not digest.get("sections"):
+        return {"status": "empty"}
+
+    sections = {
+        repo_name: [Listing.from_dict(l) for l in listings]
+        for repo_name, listings in digest["sections"].items()
+    }
+    count = sum(len(listings) for listings in sections.values())
+    age = time.time() - digest.get("started_at", 0)
+
+    if not force and age < settings.digest_window_seconds and count < settings.digest_max_listings:
+        return {"status": "buffered", "count": count, "age_seconds": int(age)}
+
+    if not emails:
+        # Nobody to send to, drop the listings like non-digest mode does
+        print(f"[DIGEST] No subscribers, dropping {count} buffered listings", flush=True)
+        state["pending_digest"] = None
+        return {"status": "no_subscribers", "count": count}
+
+    print(f"[DIGEST] Sending digest with {count} listings from {len(sections)} repos...", flush=True)
+    if not send_notification(sections, emails):
+        # Keep the buffer so the next run retries
+        return {"status": "error", "count": count}
+
+    state["pending_digest"] = None
+    return {"status": "sent", "count": count}
+
+
+# Serializes scrape runs so concurrent triggers don't race on the JSONBin state
+_scrape_lock = threading.Lock()
+
+
+def run_scrape(source_keys: list[str] | None = None) -> dict:
+    """Scrape the given sources (default all) and notify subscribers of new listings."""
+    with _scrape_lock:
+        return _run_scrape(source_keys)
+
+
+def _run_scrape(source_keys: list[str] | None) -> dict:
     state = read_jsonbin()
+    if settings.scheduler_enabled:
+        # In case the scheduler couldn't read its saved state at startup
+        scheduler.load_state(state.get("schedule"))
+    digest_mode = settings.digest_window_seconds > 0
     
     emails = get_all_brevo_contacts()
     print(f"[SCRAPE] Found {len(emails)} subscribers in Brevo", flush=True)
     
     results = {}
 
-    # Scrape Canadian Tech Internships
-    try:
-        print("[SCRAPE] Fetching Canadian internships...", flush=True)
-        listings = scrape_canadian_internships(settings.canadian_internships_url)
-        print(f"[SCRAPE] Got {len(listings)} Canadian listings", flush=True)
-
-        if listings:
-            stored_top = state.get("canadian_internships")
-            new_listings = find_new_listings(listings, stored_top)
-
-            if new_listings:
-                print(f"[SCRAPE] Sending email for {len(new_listings)} new Canadian listings...", flush=True)
-                send_notification(new_listings, "Canadian Tech Internships 2026", emails)
-                print("[SCRAPE] Email sent for Canadian", flush=True)
-                results["canadian_internships"] = {
-                    "status": "new_listings",
-                    "count": len(new_listings),
-                    "listings": [l.to_dict() for l in new_listings],
-                }
-            else:
-                results["canadian_internships"] = {
-                    "status": "no_changes",
-                }
-
-            # Update state with new top listing
-            state["canadian_internships"] = listings[0].to_dict()
+    for key in SOURCES if source_keys is None else source_keys:
+        repo_name, scrape_source, url = SOURCES[key]
+        try:
+            print(f"[SCRAPE] Fetching {repo_name}...", flush=True)
+            listings = scrape_source(url)
+            print(f"[SCRAPE] Got {len(listings)} listings for {repo_name}", flush=True)
+
+            if listings:
+                stored_top = state.get(key)
+                new_listings = find_new_listings(listings, stored_top)
+
+                if new_listings:
+                    if digest_mode:
+                        print(f"[SCRAPE] Buffering {len(new_listings)} new listings for digest", flush=True)
+                        buffer_digest(state, repo_name, new_listings)
+                    else:
+                        print(f"[SCRAPE] Sending email for {len(new_listings)} new listings...", flush=True)
+                        send_notification({repo_name: new_listings}, emails)
+                        print(f"[SCRAPE] Email sent for {repo_name}", flush=True)
+                    results[key] = {
+                        "status": "new_listings",
+                        "count": len(new_listings),
+                        "listings": [l.to_dict() for l in new_listings],
+                    }
+                else:
+                    results[key] = {
+                        "status": "no_changes",
+                    }
+
+                # Update state with new top listing
+                state[key] = listings[0].to_dict()
+                scheduler.record(key, changed=bool(new_listings))
+
+        except Exception as e:
+            results[key] = {"status": "error", "message": str(e)}
+
+    if digest_mode or state.get("pending_digest"):
+        # Also drains anything left buffered after digest mode is turned off
+        results["digest"] = flush_digest(state, emails, force=not digest_mode)
+
+    if settings.scheduler_enabled:
+        state["schedule"] = scheduler.export_state()
 
-    except Exception as e:
-        results["canadian_internships"] = {"status": "error", "message": str(e)}
+    update_jsonbin(state)
+    return results
 
-    # Scrape US Tech Internships
-    try:
-        print("[SCRAPE] Fetching US internships...", flush=True)
-        listings = scrape_us_internships(settings.us_internships_url)
-        print(f"[SCRAPE] Got {len(listings)} US listings", flush=True)
-
-        if listings:
-            stored_top = state.get("us_internships")
-            new_listings = find_new_listings(listings, stored_top)
-
-            if new_listings:
-                print(f"[SCRAPE] Sending email for {len(new_listings)} new US listings...", flush=True)
-                send_notification(new_listings, "US Summer 2026 Internships", emails)
-                print("[SCRAPE] Email sent for US", flush=True)
-                results["us_internships"] = {
-                    "status": "new_listings",
-                    "count": len(new_listings),
-                    "listings": [l.to_dict() for l in new_listings],
-                }
-            else:
-                results["us_internships"] = {
-                    "status": "no_changes",
-                }
-
-            # Update state with new top listing
-            state["us_internships"] = listings[0].to_dict()
 
-    except Exception as e:
-        results["us_internships"] = {"status": "error", "message": str(e)}
+@app.route("/scrape", methods=["GET"])
+@require_api_key
+def scrape():
+    """Scrape repos and send notifications for new listings.
 
-    update_jsonbin(state)
+    With the scheduler enabled, only sources that are due get scraped.
+    """
+    print("[SCRAPE] Starting...", flush=True)
+    source_keys = scheduler.claim_due() if settings.scheduler_enabled else None
+
+    if source_keys == [] and settings.digest_window_seconds <= 0:
+        print("[SCRAPE] No sources due", flush=True)
+        results = {}
+    else:
+        results = run_scrape(source_keys)
+
+    if settings.scheduler_enabled:
+        results["schedule"] = scheduler.snapshot()
     print("[SCRAPE] Done!", flush=True)
     return jsonify(results)
 
 
+def parse_github_url(url: str) -> tuple[str, str | None]:
+    """Return ("owner/repo", branch) for a GitHub repo URL. Branch is None for the default branch."""
+    parts = url.split("github.com/", 1)[-1].strip("/").split("/")
+    full_name = "/".join(parts[:2]).lower()
+    branch = "/".join(parts[3:]) if len(parts) > 3 and parts[2] == "tree" else None
+    return full_name, branch
+
+
+def verify_github_signature(body: bytes, signature: str | None) -> bool:
+    """Check the X-Hub-Signature-256 header against the webhook secret."""
+    if not settings.github_webhook_secret or not signature:
+        return False
+    expected = "sha256=" + hmac.new(
+        settings.github_webhook_secret.encode(), body, hashlib.sha256
+    ).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def find_push_source(payload: dict) -> str | None:
+    """Return the tracked source key a push event belongs to, if any."""
+    repo = payload.get("repository")
+    if not isinstance(repo, dict):
+        return None
+    full_name = (repo.get("full_name") or "").lower()
+    ref = payload.get("ref", "")
+
+    for key, (_, _, url) in SOURCES.items():
+        source_repo, branch = parse_github_url(url)
+        branch = branch or repo.get("default_branch")
+        if full_name == source_repo and ref == f"refs/heads/{branch}":
+            return key
+    return None
+
+
+def readme_changed(payload: dict) -> bool:
+    """Check whether any commit in a push event touched the root README."""
+    for commit in payload.get("commits") or []:
+        if not isinstance(commit, dict):
+            continue
+        for path in (commit.get("added") or []) + (commit.get("modified") or []) + (commit.get("removed") or []):
+            if isinstance(path, str) and path.lower() == "readme.md":
+                return True
+    return False
+
+
+# Pending debounced webhook scrapes: source key -> timer
+_webhook_timers: dict[str, threading.Timer] = {}
+_webhook_timers_lock = threading.Lock()
+
+
+def _run_webhook_scrape(key: str) -> None:
+    with _webhook_timers_lock:
+        if _webhook_timers.get(key) is not threading.current_thread():
+            # A newer push replaced this timer while it was firing, that one will scrape
+            return
+        del _webhook_timers[key]
+    print(f"[WEBHOOK] Scraping {key}...", flush=True)
+    try:
+        results = run_scrape([key])
+        print(f"[WEBHOOK] Done: {results.get(key, {}).get('status')}", flush=True)
+    except Exception as e:
+        print(f"[WEBHOOK] Error scraping {key}: {e}", flush=True)
+
+
+def schedule_webhook_scrape(key: str) -> None:
+    """Scrape a source after the debounce delay, restarting the delay on every push."""
+    with _webhook_timers_lock:
+        timer = _webhook_timers.get(key)
+        if timer:
+            timer.cancel()
+        timer = threading.Timer(settings.webhook_debounce_seconds, _run_webhook_scrape, args=(key,))
+        timer.daemon = True
+        _webhook_timers[key] = timer
+        timer.start()
+
+
+@app.route("/webhook/github", methods=["POST"])
+def github_webhook():
+    """GitHub push webhook. Scrapes only the pushed source when its README changed."""
+    if not settings.github_webhook_secret:
+        return jsonify({"error": "Webhook not configured"}), 404
+
+    if not verify_github_signature(request.get_data(), request.headers.get("X-Hub-Signature-256")):
+        return jsonify({"error": "Invalid signature"}), 401
+
+    event = request.headers.get("X-GitHub-Event")
+    if event == "ping":
+        return jsonify({"status": "pong"})
+    if event != "push":
+        return jsonify({"status": "ignored", "reason": f"Unsupported event '{event}'"})
+
+    # GitHub sends the JSON as a "payload" form field unless the content type is application/json
+    try:
+        if request.is_json:
+            payload = request.get_json()
+        elif "payload" in request.form:
+            payload = json.loads(request.form["payload"])
+        else:
+            return jsonify({"error": "Webhook must use content type application/json"}), 415
+    except ValueError:
+        return jsonify({"error": "Invalid JSON payload"}), 400
+
+    if not isinstance(payload, dict):
+        return jsonify({"error": "Payload must be a JSON object"}), 400
+
+    key = find_push_source(payload)
+    if not key:
+        return jsonify({"status": "ignored", "reason": "Not a tracked repo or branch"})
+
+    if not readme_changed(payload):
+        return jsonify({"status": "ignored", "reason": "README not changed", "source": key})
+
+    schedule_webhook_scrape(key)
+    print(f"[WEBHOOK] Push to {key}, scrape scheduled in {settings.webhook_debounce_seconds}s", flush=True)
+    return jsonify({
+        "status": "scheduled",
+        "source": key,
+        "delay_seconds": settings.webhook_debounce_seconds,
+    }), 202
+
+
+@app.route("/schedule", methods=["GET"])
+@require_api_key
+def get_schedule():
+    """Get the in-process polling schedule for each source."""
+    return jsonify({
+        "enabled": settings.scheduler_enabled,
+        "sources": scheduler.snapshot(),
+    })
+
+
 @app.route("/ping", methods=["GET"])
 def ping():
     """Simple ping endpoint to wake up the service."""
@@ -554,7 +864,17 @@ def admin_broadcast():
         return jsonify({"error": "Failed to send broadcast"}), 500
 
 
+@app.route("/admin/profiles/<filename>", methods=["GET"])
+@require_api_key
+def get_profile(filename: str):
+    """Admin endpoint to download a saved request profile."""
+    return send_from_directory(settings.profile_dir, filename, as_attachment=True)
+
+
+if settings.scheduler_enabled:
+    scheduler.start()
+
+
 if __name__ == "__main__":
-    import os
     port = int(os.environ.get("PORT", 8000))
     app.run(host="0.0.0.0", port=port)
@@ -17,6 +17,26 @@ class Settings(BaseSettings):
     canadian_internships_url: str = "https://github.com/negarprh/Canadian-Tech-Internships-2026"
     us_internships_url: str = "https://github.com/SimplifyJobs/Summer2026-Internships/tree/dev"
 
+    # Digest coalescing (0 disables it and sends one email per source per scrape)
+    digest_window_seconds: int = 0
+    digest_max_listings: int = 50
+
+    # GitHub push webhook (empty secret disables /webhook/github)
+    github_webhook_secret: str = ""
+    webhook_debounce_seconds: int = 30
+
+    # Request profiling for protected endpoints (?profile=1 or X-Profile: 1)
+    profile_dir: str = "/tmp/jobflow-profiles"
+    profile_top_n: int = 25
+    profile_max_files: int = 50
+
+    # In-process adaptive polling (runs alongside the external /scrape pinger)
+    scheduler_enabled: bool = False
+    scheduler_initial_interval_seconds: int = 900
+    scheduler_min_interval_seconds: int = 120
+    scheduler_max_interval_seconds: int = 3600
+    scheduler_jitter: float = 0.1
+
     class Config:
         env_file = ".env"
 
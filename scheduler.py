@@ -0,0 +1,204 @@
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable
+
+# Each change scales down older hour-of-day counts so the profile follows recent activity
+HOURLY_DECAY = 0.95
+
+
+@dataclass
+class SourceSchedule:
+    key: str
+    interval: float
+    next_run: float
+    last_run: float | None = None
+    last_change: float | None = None
+    runs: int = 0
+    changes: int = 0
+    hourly_changes: list[float] = field(default_factory=lambda: [0.0] * 24)
+
+    def to_dict(self) -> dict:
+        return {
+            "interval_seconds": round(self.interval),
+            "next_run": _isoformat(self.next_run),
+            "last_run": _isoformat(self.last_run),
+            "last_change": _isoformat(self.last_change),
+            "runs": self.runs,
+            "changes": self.changes,
+        }
+
+    def to_state(self) -> dict:
+        """What gets persisted across restarts."""
+        return {
+            "interval": round(self.interval, 1),
+            "hourly_changes": [round(count, 4) for count in self.hourly_changes],
+            "last_change": self.last_change,
+        }
+
+
+def _isoformat(timestamp: float | None) -> str | None:
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec="seconds")
+
+
+class PollScheduler:
+    """Polls each source on its own interval, adapted to how often it changes.
+
+    The base interval halves whenever a poll finds new listings and grows by
+    a quarter when it doesn't. The interval actually used is then scaled by
+    how active the source usually is at the current UTC hour, jittered, and
+    clamped to [min_interval, max_interval].
+    """
+
+    def __init__(
+        self,
+        keys: list[str],
+        poll: Callable[[list[str]], object],
+        load: Callable[[], dict | None],
+        initial_interval: float,
+        min_interval: float,
+        max_interval: float,
+        jitter: float,
+    ):
+        self.poll = poll
+        self.load = load
+        self.loaded = False
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        now = time.time()
+        initial_interval = self._clamp(initial_interval)
+        self.sources = {
+            key: SourceSchedule(
+                key=key,
+                interval=initial_interval,
+                next_run=now + self._jittered(initial_interval),
+            )
+            for key in keys
+        }
+
+    def _clamp(self, interval: float) -> float:
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def _jittered(self, interval: float) -> float:
+        return self._clamp(interval * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def _effective_interval(self, source: SourceSchedule, now: float) -> float:
+        """Scale the base interval by the source's activity at this hour of day."""
+        hourly = source.hourly_changes
+        mean = sum(hourly) / len(hourly)
+        hour = datetime.fromtimestamp(now, timezone.utc).hour
+        weight = (hourly[hour] + 1) / (mean + 1)
+        return self._jittered(source.interval / weight)
+
+    def record(self, key: str, changed: bool) -> None:
+        """Record a poll result for a source and schedule its next run."""
+        source = self.sources.get(key)
+        if not source:
+            return
+
+        now = time.time()
+        with self._lock:
+            source.last_run = now
+            source.runs += 1
+            if changed:
+                source.last_change = now
+                source.changes += 1
+                source.hourly_changes = [count * HOURLY_DECAY for count in source.hourly_changes]
+                source.hourly_changes[datetime.fromtimestamp(now, timezone.utc).hour] += 1
+                source.interval = self._clamp(source.interval / 2)
+            else:
+                source.interval = self._clamp(source.interval * 1.25)
+            source.next_run = now + self._effective_interval(source, now)
+
+        # Wake the loop in case this source is now due earlier than it was waiting for
+        self._wakeup.set()
+
+    def load_state(self, data: dict | None) -> None:
+        """Restore what was learned before a restart. Only the first saved state is applied."""
+        if self.loaded or not isinstance(data, dict):
+            return
+
+        now = time.time()
+        with self._lock:
+            for key, saved in data.items():
+                source = self.sources.get(key)
+                if not source or not isinstance(saved, dict):
+                    continue
+                try:
+                    source.interval = self._clamp(float(saved["interval"]))
+                    hourly = [float(count) for count in saved.get("hourly_changes") or []]
+                    if len(hourly) == 24:
+                        source.hourly_changes = hourly
+                    source.last_change = saved.get("last_change")
+                except (KeyError, TypeError, ValueError) as e:
+                    print(f"[SCHEDULER] Ignoring saved state for {key}: {e}", flush=True)
+                    continue
+                source.next_run = now + self._effective_interval(source, now)
+            self.loaded = True
+
+        print(f"[SCHEDULER] Restored saved state for {len(data)} sources", flush=True)
+        self._wakeup.set()
+
+    def export_state(self) -> dict:
+        """Return the per-source state to persist."""
+        with self._lock:
+            return {key: source.to_state() for key, source in self.sources.items()}
+
+    def snapshot(self) -> dict:
+        """Return the current schedule for every source."""
+        with self._lock:
+            return {key: source.to_dict() for key, source in self.sources.items()}
+
+    def claim_due(self) -> list[str]:
+        """Return the sources that are due and push their next run out.
+
+        The provisional next run keeps a source from being claimed twice
+        while it is being polled, and doubles as the retry time if the poll
+        fails. A successful poll replaces it through record().
+        """
+        now = time.time()
+        with self._lock:
+            due = [source for source in self.sources.values() if source.next_run <= now]
+            for source in due:
+                source.next_run = now + self._effective_interval(source, now)
+        return [source.key for source in due]
+
+    def start(self) -> None:
+        """Start the polling loop in a daemon thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="poll-scheduler", daemon=True)
+        self._thread.start()
+        print(f"[SCHEDULER] Started for {len(self.sources)} sources", flush=True)
+
+    def _run(self) -> None:
+        try:
+            self.load_state(self.load())
+        except Exception as e:
+            print(f"[SCHEDULER] Error loading saved state: {e}", flush=True)
+
+        while True:
+            due = self.claim_due()
+            if due:
+                # One poll for every due source so they share a single state read/write
+                print(f"[SCHEDULER] Polling {', '.join(due)}...", flush=True)
+                try:
+                    self.poll(due)
+                except Exception as e:
+                    print(f"[SCHEDULER] Error polling {', '.join(due)}: {e}", flush=True)
+                continue
+
+            with self._lock:
+                delay = min(source.next_run for source in self.sources.values()) - time.time()
+            if delay > 0:
+                self._wakeup.wait(delay)
+                self._wakeup.clear()